@@ -1,12 +1,53 @@
 import os
+import re
+import warnings
+from functools import lru_cache
 import cv2
 import numpy as np
 import open3d as o3d
 
+# Numba is optional; it is only needed for the "numba" unprojection backend
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# CuPy is optional; it is only needed for the "cupy" (GPU) unprojection backend
+try:
+    import cupy as cp
+    CUPY_AVAILABLE = True
+except ImportError:
+    CUPY_AVAILABLE = False
+
+# Matches "fx: 123.4", "fy=123.4", ... anywhere in the calibration file
+_INTRINSICS_RE = re.compile(r"(fx|fy|cx|cy)\s*[:=]\s*([\d.eE+-]+)")
+
+@lru_cache(maxsize=32)
+def _load_camera_intrinsics(calibration_file, mtime):
+    # mtime is part of the cache key so an edited calibration file is re-read
+    # Stream the file line by line and stop as soon as all four are found;
+    # keep the first occurrence of each parameter
+    params = {}
+    with open(calibration_file, 'r') as f:
+        for line in f:
+            for name, value in _INTRINSICS_RE.findall(line):
+                params.setdefault(name, float(value))
+            if len(params) == 4:
+                break
+    
+    if not all(name in params for name in ('fx', 'fy', 'cx', 'cy')):
+        raise ValueError("Could not extract all intrinsic parameters")
+    
+    return params['fx'], params['fy'], params['cx'], params['cy']
+
 def load_camera_intrinsics(calibration_file):
     """
     Load camera intrinsic parameters from the calibration file with improved robustness.
     
+    Results are cached per (path, modification time), so frames sharing a
+    calibration file only read and parse it once.
+    
     Args:
         calibration_file (str): Path to the calibration parameters file.
     
@@ -14,74 +55,334 @@ def load_camera_intrinsics(calibration_file):
         tuple: Focal lengths (fx, fy) and optical center (cx, cy)
     """
     try:
-        with open(calibration_file, 'r') as f:
-            content = f.read()
-        
-        # More flexible parsing using regex or multiple parsing strategies
-        import re
-        
-        # Try different parsing methods
-        def extract_param(param_name):
-            # First try exact match
-            exact_match = re.search(rf"{param_name}:\s*([\d.]+)", content)
-            if exact_match:
-                return float(exact_match.group(1))
-            
-            # Then try comma-separated values
-            comma_match = re.search(rf"{param_name}:\s*([\d.]+)\s*[,\n]", content)
-            if comma_match:
-                return float(comma_match.group(1))
-            
-            return None
-        
-        # Extract parameters
-        fx = extract_param('fx')
-        fy = extract_param('fy')
-        cx = extract_param('cx')
-        cy = extract_param('cy')
-        
-        if not all([fx, fy, cx, cy]):
-            raise ValueError("Could not extract all intrinsic parameters")
-        
-        return fx, fy, cx, cy
+        return _load_camera_intrinsics(calibration_file, os.path.getmtime(calibration_file))
     
     except Exception as e:
         print(f"❌ Error parsing calibration file: {e}")
         raise
 
-def preprocess_depth_image(depth_image):
+def remove_local_depth_outliers(depth_image, mad_threshold, cell_size=32):
+    """
+    Zero out depth outliers with a median/MAD range check per grid cell.
+    
+    The range check is local so that foreground objects (plants in front of the
+    ground) are kept; only pixels that disagree with their own neighbourhood are
+    removed. Objects that only cover a small part of a cell (edges, thin stems)
+    can still be trimmed there, so this is opt-in.
+    
+    Cells where most pixels share one depth have a MAD of zero and are left
+    untouched, so a lone spike in such a cell is not removed here; the 3x3
+    median filter in preprocess_depth_image takes care of isolated spikes.
+    
+    Args:
+        depth_image (np.ndarray): uint16 depth image, modified in place
+        mad_threshold (float): Maximum distance from the cell median, in robust
+            standard deviations (1.4826 * MAD)
+        cell_size (int): Grid cell size in pixels
+    
+    Returns:
+        np.ndarray: The filtered depth image
+    """
+    h, w = depth_image.shape
+    c = cell_size
+    
+    # Pad to whole cells and view the frame as (rows, cols, pixels per cell);
+    # invalid pixels become NaN so they don't count towards the statistics
+    depth = np.pad(depth_image.astype(np.float32), ((0, -h % c), (0, -w % c)))
+    depth[depth == 0] = np.nan
+    H, W = depth.shape
+    cells = depth.reshape(H // c, c, W // c, c).transpose(0, 2, 1, 3).reshape(H // c, W // c, c * c)
+    
+    with warnings.catch_warnings():
+        # Cells without any valid depth give NaN statistics, which flag nothing
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(cells, axis=2, keepdims=True)
+        deviation = np.abs(cells - median)
+        sigma = 1.4826 * np.nanmedian(deviation, axis=2, keepdims=True)
+    
+    outliers = (deviation > mad_threshold * sigma) & (sigma > 0)
+    outliers = outliers.reshape(H // c, W // c, c, c).transpose(0, 2, 1, 3).reshape(H, W)
+    depth_image[outliers[:h, :w]] = 0
+    
+    return depth_image
+
+def preprocess_depth_image(depth_image, mad_threshold=None):
     """
     Preprocess depth image to remove invalid and noisy depth values.
     
     Args:
-        depth_image (np.ndarray): Input depth image
+        depth_image (np.ndarray): Input single-channel depth image
+        mad_threshold (float, optional): Zero out depths further than this many
+            robust standard deviations from the median depth of their grid cell
+            (see remove_local_depth_outliers). None disables the filter.
     
     Returns:
         np.ndarray: Preprocessed depth image
     """
-    # Ensure single channel
-    if len(depth_image.shape) > 2:
-        depth_image = depth_image[:, :, 0]
+    # Work on a uint16 copy so the caller's array is left untouched
+    depth_image = depth_image.astype(np.uint16)
     
     # Remove invalid depth values (zero or extremely large)
-    depth_image = np.where(
-        (depth_image > 0) & (depth_image < 10000),  # Adjust threshold as needed
-        depth_image, 
-        0
-    )
+    depth_image[depth_image >= 10000] = 0  # Adjust threshold as needed
     
-    # Optional: Apply median filtering to reduce noise
-    depth_image = cv2.medianBlur(depth_image.astype(np.uint16), 3)
+    # Optional: Remove depth outliers in 2D with a local median/MAD range check,
+    # which is far cheaper than a KD-tree statistical filter on the point cloud
+    if mad_threshold is not None:
+        depth_image = remove_local_depth_outliers(depth_image, mad_threshold)
+    
+    # Optional: Apply median filtering to reduce noise, only inside the bounding
+    # box of valid depths (padded by the kernel radius). Outside it every 3x3
+    # window is all zeros, so the result is identical to filtering the full frame.
+    rows = np.flatnonzero(depth_image.any(axis=1))
+    if rows.size == 0:
+        return depth_image
+    cols = np.flatnonzero(depth_image.any(axis=0))
+    h, w = depth_image.shape
+    y0, y1 = max(rows[0] - 1, 0), min(rows[-1] + 2, h)
+    x0, x1 = max(cols[0] - 1, 0), min(cols[-1] + 2, w)
+    depth_image[y0:y1, x0:x1] = cv2.medianBlur(np.ascontiguousarray(depth_image[y0:y1, x0:x1]), 3)
     
     return depth_image
 
+def temporal_filter(prev, curr, thresh_mm=50):
+    """
+    Average the current depth frame with the previous one where they agree.
+    
+    Pixels whose depth changed by less than the threshold are treated as static
+    flicker and replaced by the mean of both frames; moving or newly valid
+    pixels keep the current value.
+    
+    Args:
+        prev (np.ndarray): Previous (already filtered) uint16 depth frame
+        curr (np.ndarray): Current uint16 depth frame
+        thresh_mm (int): Maximum difference in raw depth units (mm at 0.001 scale)
+    
+    Returns:
+        np.ndarray: Filtered uint16 depth frame
+    """
+    diff = np.abs(curr.astype(np.int32) - prev.astype(np.int32))
+    m = (diff < thresh_mm) & (curr > 0) & (prev > 0)
+    out = curr.copy()
+    out[m] = ((curr[m].astype(np.uint32) + prev[m].astype(np.uint32)) >> 1).astype(np.uint16)
+    return out
+
+def unproject_depth_numpy(depth, fx, fy, cx, cy, depth_scale, min_depth, max_depth):
+    """
+    Unproject a depth image into 3D points using vectorized NumPy operations.
+    
+    Args:
+        depth (np.ndarray): Preprocessed single-channel depth image
+        fx, fy (float): Focal lengths
+        cx, cy (float): Optical center
+        depth_scale (float): Scale factor to convert depth to meters
+        min_depth (float): Minimum valid depth in meters
+        max_depth (float): Maximum valid depth in meters
+    
+    Returns:
+        np.ndarray: (N, 3) float32 array of points
+    """
+    h, w = depth.shape
+    
+    u, v = np.meshgrid(np.arange(w), np.arange(h))
+    Z = depth.astype(np.float32) * depth_scale
+    
+    # Filter depth values
+    m = (Z > min_depth) & (Z < max_depth)
+    
+    # Fill a preallocated float32 buffer column by column
+    N = int(m.sum())
+    points = np.empty((N, 3), dtype=np.float32)
+    points[:, 2] = Z[m]
+    points[:, 0] = (u[m] - cx) * points[:, 2] / fx
+    points[:, 1] = (v[m] - cy) * points[:, 2] / fy
+    
+    return points
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _unproject_rows_numba(depth, fx, fy, cx, cy, scale, mn, mx, out, row_counts):
+        # Each row writes its valid points to its own slice of `out`
+        h, w = depth.shape
+        for v in prange(h):
+            base = v * w
+            count = 0
+            for u in range(w):
+                z = np.float32(depth[v, u]) * scale
+                if z > mn and z < mx:
+                    out[base + count, 0] = (u - cx) * z / fx
+                    out[base + count, 1] = (v - cy) * z / fy
+                    out[base + count, 2] = z
+                    count += 1
+            row_counts[v] = count
+
+    @njit(cache=True)
+    def _compact_rows_numba(out, row_counts, w):
+        # Prefix sum over row counts; rows only ever move towards the front
+        offset = 0
+        for v in range(row_counts.shape[0]):
+            base = v * w
+            for k in range(row_counts[v]):
+                out[offset + k, 0] = out[base + k, 0]
+                out[offset + k, 1] = out[base + k, 1]
+                out[offset + k, 2] = out[base + k, 2]
+            offset += row_counts[v]
+        return offset
+
+    def _unproject_numba(depth, fx, fy, cx, cy, scale, mn, mx, out):
+        """
+        Unproject a depth image into a preallocated (H*W, 3) buffer with Numba.
+        
+        Returns:
+            int: Number of valid points written to the front of `out`
+        """
+        row_counts = np.empty(depth.shape[0], dtype=np.int64)
+        _unproject_rows_numba(
+            depth, np.float32(fx), np.float32(fy), np.float32(cx), np.float32(cy),
+            np.float32(scale), np.float32(mn), np.float32(mx), out, row_counts
+        )
+        return _compact_rows_numba(out, row_counts, depth.shape[1])
+
+    @njit(fastmath=True, boundscheck=False, cache=True)
+    def _unproject_fused_numba(depth, fx, fy, cx, cy, scale, mn, mx, out_x, out_y, out_z):
+        # Single pass over the frame: scale, range check, unprojection and compaction
+        h, w = depth.shape
+        inv_fx = np.float32(1.0) / fx
+        inv_fy = np.float32(1.0) / fy
+        count = 0
+        for v in range(h):
+            y_factor = (np.float32(v) - cy) * inv_fy
+            for u in range(w):
+                z = np.float32(depth[v, u]) * scale
+                if z > mn and z < mx:
+                    out_x[count] = (np.float32(u) - cx) * inv_fx * z
+                    out_y[count] = y_factor * z
+                    out_z[count] = z
+                    count += 1
+        return count
+
+    def _unproject_numba_fused(depth, fx, fy, cx, cy, scale, mn, mx):
+        """
+        Unproject a small depth image in one serial Numba pass into X/Y/Z buffers.
+        
+        Returns:
+            np.ndarray: (N, 3) float32 array of points
+        """
+        n = depth.size
+        out_x = np.empty(n, dtype=np.float32)
+        out_y = np.empty(n, dtype=np.float32)
+        out_z = np.empty(n, dtype=np.float32)
+        count = _unproject_fused_numba(
+            depth, np.float32(fx), np.float32(fy), np.float32(cx), np.float32(cy),
+            np.float32(scale), np.float32(mn), np.float32(mx), out_x, out_y, out_z
+        )
+        return np.stack([out_x[:count], out_y[:count], out_z[:count]], axis=1)
+
+# Frames up to this many pixels (a 512 KB uint16 frame) stay cache-resident, so
+# the single-pass serial kernel beats spinning up the parallel one
+NUMBA_FUSED_MAX_PIXELS = 256 * 1024
+
+if CUPY_AVAILABLE:
+    _unproject_kernel_cupy = cp.ElementwiseKernel(
+        'uint16 d, float32 fx, float32 fy, float32 cx, float32 cy, float32 s, int32 w',
+        'float32 X, float32 Y, float32 Z',
+        'int u = i % w; int v = i / w; Z = d * s; X = (u - cx) * Z / fx; Y = (v - cy) * Z / fy;',
+        'unproject_depth'
+    )
+
+def unproject_depth_cupy(depth, fx, fy, cx, cy, depth_scale, min_depth, max_depth):
+    """
+    Unproject a depth image into 3D points on the GPU with a CuPy kernel.
+    
+    Args:
+        depth (np.ndarray): Preprocessed single-channel uint16 depth image
+        fx, fy (float): Focal lengths
+        cx, cy (float): Optical center
+        depth_scale (float): Scale factor to convert depth to meters
+        min_depth (float): Minimum valid depth in meters
+        max_depth (float): Maximum valid depth in meters
+    
+    Returns:
+        cp.ndarray: (N, 3) float32 array of points, resident on the GPU
+    """
+    d = cp.ascontiguousarray(cp.asarray(depth))
+    X, Y, Z = _unproject_kernel_cupy(d, fx, fy, cx, cy, depth_scale, d.shape[1])
+    
+    # Filter depth values
+    m = (Z > min_depth) & (Z < max_depth)
+    
+    return cp.stack([X[m], Y[m], Z[m]], axis=1)
+
+def unproject_depth_open3d(depth, fx, fy, cx, cy, depth_scale, min_depth, max_depth, device, stride=1):
+    """
+    Unproject a depth image with Open3D's native create_from_depth_image factory.
+    
+    Args:
+        depth (np.ndarray): Preprocessed single-channel uint16 depth image
+        fx, fy (float): Focal lengths
+        cx, cy (float): Optical center
+        depth_scale (float): Scale factor to convert depth to meters
+        min_depth (float): Minimum valid depth in meters
+        max_depth (float): Maximum valid depth in meters
+        device (o3d.core.Device): Device to build the point cloud on
+        stride (int): Use every stride-th pixel (1 = all pixels)
+    
+    Returns:
+        o3d.t.geometry.PointCloud: Unprojected point cloud on `device`
+    """
+    # The factory only truncates far depths, so drop near ones beforehand
+    depth = depth.copy()
+    depth[depth * np.float32(depth_scale) <= min_depth] = 0
+    
+    intrinsics = o3d.core.Tensor(
+        [[fx, 0, cx], [0, fy, cy], [0, 0, 1]], dtype=o3d.core.float64
+    )
+    depth_o3d = o3d.t.geometry.Image(o3d.core.Tensor(depth, device=device))
+    
+    return o3d.t.geometry.PointCloud.create_from_depth_image(
+        depth_o3d,
+        intrinsics,
+        depth_scale=1.0 / depth_scale,  # Open3D divides raw depth by this
+        depth_max=max_depth,
+        stride=stride
+    )
+
+def read_depth_image(depth_image_path):
+    """
+    Read a single-channel depth image from disk.
+    
+    Args:
+        depth_image_path (str): Path to depth image
+    
+    Returns:
+        np.ndarray: Depth image as stored on disk
+    """
+    # IMREAD_ANYDEPTH keeps 16-bit values and always decodes a single channel
+    depth = cv2.imread(depth_image_path, cv2.IMREAD_ANYDEPTH)
+    if depth is None:
+        raise ValueError(f"❌ Could not load depth image: {depth_image_path}")
+    if depth.dtype not in (np.uint16, np.uint8, np.float32):
+        raise ValueError(f"❌ Unsupported depth image type {depth.dtype}: {depth_image_path}")
+    
+    return depth
+
+def point_cloud_save_path(depth_image_path, save_dir):
+    """Return the .ply path a depth frame's point cloud is saved to in save_dir."""
+    file_name = os.path.splitext(os.path.basename(depth_image_path))[0] + ".ply"
+    return os.path.join(save_dir, file_name)
+
 def depth_to_point_cloud(
     depth_image_path, 
     calibration_file, 
     save_dir=None, 
     depth_scale=0.001,  # Configurable depth scale
     min_depth=0.1,      # Minimum valid depth
-    max_depth=10.0      # Maximum valid depth
+    max_depth=10.0,     # Maximum valid depth
+    statistical_filter=True,  # Statistical outlier removal on the point cloud
+    mad_threshold=None, # Local 2D depth outlier filter (see preprocess_depth_image)
+    depth_image=None,   # Already preprocessed depth image (skips reading the file)
+    visualize=True,     # Show the resulting point cloud
+    backend="open3d",   # Unprojection backend: "open3d", "cupy", "numba" or "numpy"
+    stride=1            # Use every stride-th pixel in both directions
 ):
     """
     Convert depth image to a cleaned 3D point cloud with advanced preprocessing.
@@ -93,6 +394,16 @@ def depth_to_point_cloud(
         depth_scale (float): Scale factor to convert depth to meters
         min_depth (float): Minimum valid depth in meters
         max_depth (float): Maximum valid depth in meters
+        statistical_filter (bool): Also run Open3D's statistical outlier removal
+        mad_threshold (float, optional): Local median/MAD depth outlier threshold
+            passed to preprocess_depth_image; None disables the filter
+        depth_image (np.ndarray, optional): Preprocessed depth image; if given,
+            depth_image_path is only used to name the saved point cloud
+        visualize (bool): Open a viewer window with the resulting point cloud
+        backend (str): How to unproject the depth image: "open3d" (Open3D's
+            native factory, default), "cupy" (GPU kernel, needs CuPy and CUDA),
+            "numba" (JIT kernels, needs Numba) or "numpy" (vectorized NumPy)
+        stride (int): Use every stride-th pixel in both directions (1 = all pixels)
     
     Returns:
         o3d.geometry.PointCloud: Processed point cloud
@@ -100,64 +411,172 @@ def depth_to_point_cloud(
     # Load camera intrinsics
     fx, fy, cx, cy = load_camera_intrinsics(calibration_file)
     
-    # Read depth image
-    depth = cv2.imread(depth_image_path, cv2.IMREAD_UNCHANGED)
-    if depth is None:
-        raise ValueError(f"❌ Could not load depth image: {depth_image_path}")
+    # Read and preprocess depth image
+    if depth_image is None:
+        depth = preprocess_depth_image(read_depth_image(depth_image_path), mad_threshold)
+    else:
+        depth = depth_image
     
-    # Preprocess depth image
-    depth = preprocess_depth_image(depth)
+    # Run on the GPU when Open3D was built with CUDA
+    use_cuda = o3d.core.cuda.is_available()
+    device = o3d.core.Device("CUDA:0" if use_cuda else "CPU:0")
     
-    h, w = depth.shape
-    points = []
-    
-    # Vectorized point cloud generation
-    for v in range(h):
-        for u in range(w):
-            Z = depth[v, u] * depth_scale
-            
-            # Filter depth values
-            if min_depth < Z < max_depth:
-                X = (u - cx) * Z / fx
-                Y = (v - cy) * Z / fy
-                points.append([X, Y, Z])
-    
-    # Convert to point cloud
-    points = np.array(points)
-    pcd = o3d.geometry.PointCloud()
-    pcd.points = o3d.utility.Vector3dVector(points)
-    
-    # Advanced noise removal
-    print("🧹 Applying advanced noise removal...")
-    
-    # Statistical outlier removal
-    pcd, _ = pcd.remove_statistical_outlier(
-        nb_neighbors=20,   # Number of neighbors to analyze
-        std_ratio=1.5      # Standard deviation multiplier (lower = more aggressive)
-    )
+    # Point cloud generation
+    if backend == "open3d":
+        pcd = unproject_depth_open3d(depth, fx, fy, cx, cy, depth_scale, min_depth, max_depth, device, stride)
+    else:
+        # Subsample the image and scale the intrinsics to match, which is exactly
+        # equivalent to unprojecting every stride-th pixel of the full image
+        if stride > 1:
+            depth = np.ascontiguousarray(depth[::stride, ::stride])
+            fx, fy, cx, cy = fx / stride, fy / stride, cx / stride, cy / stride
+        h, w = depth.shape
+        
+        if backend == "cupy":
+            if not (use_cuda and CUPY_AVAILABLE):
+                raise ValueError("❌ The cupy backend needs CuPy and an Open3D build with CUDA")
+            points = unproject_depth_cupy(depth, fx, fy, cx, cy, depth_scale, min_depth, max_depth)
+            # Hand the device buffer to Open3D without a round trip through host memory
+            points = o3d.core.Tensor.from_dlpack(points.toDlpack())
+        elif backend == "numba":
+            if not NUMBA_AVAILABLE:
+                raise ValueError("❌ The numba backend needs Numba to be installed")
+            if h * w <= NUMBA_FUSED_MAX_PIXELS:
+                points = _unproject_numba_fused(depth, fx, fy, cx, cy, depth_scale, min_depth, max_depth)
+            else:
+                points = np.empty((h * w, 3), dtype=np.float32)
+                N = _unproject_numba(depth, fx, fy, cx, cy, depth_scale, min_depth, max_depth, points)
+                points = points[:N]
+            points = o3d.core.Tensor(points, device=device)
+        elif backend == "numpy":
+            points = unproject_depth_numpy(depth, fx, fy, cx, cy, depth_scale, min_depth, max_depth)
+            points = o3d.core.Tensor(points, device=device)
+        else:
+            raise ValueError(f"❌ Unknown unprojection backend: {backend}")
+        
+        pcd = o3d.t.geometry.PointCloud(points)
     
-    # Optional: Radius outlier removal for additional cleaning
-    pcd, _ = pcd.remove_radius_outlier(
-        nb_points=16,      # Minimum points in neighborhood
-        radius=0.05        # Radius of neighborhood
-    )
+    # Advanced noise removal (the tensor filters raise on an empty point cloud)
+    if pcd.is_empty():
+        print(f"⚠️ No valid depth points in {depth_image_path}, skipping noise removal")
+    else:
+        print(f"🧹 Applying advanced noise removal on {device}...")
+        
+        # Downsample first: voxel grid is O(N) and shrinks the input of the
+        # KD-tree based outlier filters below
+        pcd = pcd.voxel_down_sample(voxel_size=0.01)
+        
+        # Optional: Statistical outlier removal
+        if statistical_filter:
+            if hasattr(pcd, "remove_statistical_outliers"):
+                pcd, _ = pcd.remove_statistical_outliers(
+                    nb_neighbors=20,   # Number of neighbors to analyze
+                    std_ratio=1.5      # Standard deviation multiplier (lower = more aggressive)
+                )
+            else:
+                # Older Open3D releases only provide this filter on the legacy point cloud
+                legacy_pcd, _ = pcd.to_legacy().remove_statistical_outlier(nb_neighbors=20, std_ratio=1.5)
+                pcd = o3d.t.geometry.PointCloud.from_legacy(legacy_pcd, o3d.core.float32, device)
+        
+        # Optional: Radius outlier removal for additional cleaning
+        if not pcd.is_empty():
+            pcd, _ = pcd.remove_radius_outliers(
+                nb_points=16,      # Minimum points in neighborhood
+                search_radius=0.05 # Radius of neighborhood
+            )
     
-    # Optional: Downsampling to reduce point cloud size
-    pcd = pcd.voxel_down_sample(voxel_size=0.01)
+    # Back to a legacy point cloud for visualization, saving and the caller
+    pcd = pcd.to_legacy()
     
     # Visualization (optional)
-    o3d.visualization.draw_geometries([pcd])
+    if visualize:
+        o3d.visualization.draw_geometries([pcd])
     
     # Save point cloud
     if save_dir:
         os.makedirs(save_dir, exist_ok=True)
-        file_name = os.path.splitext(os.path.basename(depth_image_path))[0] + ".ply"
-        save_path = os.path.join(save_dir, file_name)
-        o3d.io.write_point_cloud(save_path, pcd)
+        save_path = point_cloud_save_path(depth_image_path, save_dir)
+        # Binary PLY is much smaller and faster to write than ASCII; readers auto-detect it
+        o3d.io.write_point_cloud(save_path, pcd, write_ascii=False, compressed=True, print_progress=False)
         print(f"✅ Point cloud saved at: {save_path}")
     
     return pcd
 
+def depth_folder_to_point_clouds(
+    depth_dir,
+    calibration_file,
+    save_dir=None,
+    depth_scale=0.001,
+    min_depth=0.1,
+    max_depth=10.0,
+    temporal_thresh_mm=50,
+    statistical_filter=True,
+    mad_threshold=None,
+    backend="open3d",
+    stride=1
+):
+    """
+    Convert every depth frame in a folder to a point cloud, in frame order.
+    
+    Consecutive frames are smoothed with temporal_filter before unprojection,
+    which removes static flicker that the outlier filters would otherwise
+    have to clean up frame by frame.
+    
+    Args:
+        depth_dir (str): Folder with depth frames (frame_*.png)
+        calibration_file (str): Path to camera calibration file
+        save_dir (str, optional): Directory to save point clouds
+        depth_scale (float): Scale factor to convert depth to meters
+        min_depth (float): Minimum valid depth in meters
+        max_depth (float): Maximum valid depth in meters
+        temporal_thresh_mm (int): Temporal filter threshold in raw depth units
+        statistical_filter (bool): Also run Open3D's statistical outlier removal
+        mad_threshold (float, optional): Local median/MAD depth outlier threshold
+            passed to preprocess_depth_image; None disables the filter
+        backend (str): Unprojection backend (see depth_to_point_cloud)
+        stride (int): Use every stride-th pixel in both directions
+    
+    Returns:
+        list: Paths of the saved .ply files if save_dir is given (clouds are not
+            kept in memory), otherwise the processed o3d.geometry.PointCloud
+            objects, one per frame
+    """
+    frame_names = sorted(f for f in os.listdir(depth_dir) if f.lower().endswith(".png"))
+    print(f"Processing {len(frame_names)} depth frames from {depth_dir}")
+    
+    results = []
+    prev_depth = None
+    for frame_name in frame_names:
+        depth_image_path = os.path.join(depth_dir, frame_name)
+        depth = preprocess_depth_image(read_depth_image(depth_image_path), mad_threshold)
+        
+        # Keep a one-frame history for the temporal filter
+        if prev_depth is not None and prev_depth.shape == depth.shape:
+            depth = temporal_filter(prev_depth, depth, temporal_thresh_mm)
+        prev_depth = depth
+        
+        pcd = depth_to_point_cloud(
+            depth_image_path,
+            calibration_file,
+            save_dir,
+            depth_scale=depth_scale,
+            min_depth=min_depth,
+            max_depth=max_depth,
+            statistical_filter=statistical_filter,
+            depth_image=depth,
+            visualize=False,
+            backend=backend,
+            stride=stride
+        )
+        
+        # Only hold on to the clouds when they are not being written to disk
+        if save_dir:
+            results.append(point_cloud_save_path(depth_image_path, save_dir))
+        else:
+            results.append(pcd)
+    
+    return results
+
 # Example usage
 if __name__ == "__main__":
     depth_image_path = r"M:\Research\Data\Weeds\Vidalia2\01\depth_frames\frame_0067.png"
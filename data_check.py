@@ -1,9 +1,26 @@
 import os
 
 def list_files(startpath):
-    for root, dirs, files in os.walk(startpath):
+    # os.scandir entries carry the file type from the OS, so no extra stat per file
+    stack = [startpath]
+    while stack:
+        root = stack.pop()
+        # Like os.walk, silently skip directories that can't be read
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError:
+            continue
         print(f"Directory: {root}")
-        for file in files:
-            print(os.path.join(root, file))
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir():
+                # Like os.walk, symlinked directories are neither listed nor entered
+                if not entry.is_symlink():
+                    subdirs.append(entry.path)
+            else:
+                print(entry.path)
+        # Reversed so subdirectories are visited in listing order, like os.walk
+        stack.extend(reversed(subdirs))
 
 list_files(r"M:\Research\Peanut_data\data")
\ No newline at end of file
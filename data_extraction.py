@@ -1,49 +1,66 @@
 import os
 import shutil
-import cv2
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
-def extract_frames(video_path, save_folder, fps=15, interval=1):
-    """Extract frames at specified time intervals from a video."""
+FFMPEG_PATH = r"C:\ffmpeg\ffmpeg-7.1-essentials_build\bin\ffmpeg.exe"  # <-- Change to your ffmpeg.exe location
+
+def extract_frames(video_path, save_folder, fps=15, interval=1, is_depth=False, png_compression=1):
+    """Extract frames at specified time intervals from a video using FFmpeg.
+    
+    FFmpeg only keeps one frame every 'interval' seconds, so there is no per-frame
+    decode/encode round trip through Python. 'fps' is kept for reference only.
+    Set 'is_depth' for 16-bit depth videos to keep 16-bit grayscale PNGs.
+    'png_compression' is the PNG zlib level 0-9 (1 = fastest, larger files).
+    """
     print(f"Opening video: {video_path}")
     
     if not os.path.exists(save_folder):
         os.makedirs(save_folder)
     
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print(f"❌ Error: Could not open video {video_path}")
+    # Same naming as before: frame_0000.png, frame_0001.png, ...
+    out_pattern = os.path.join(save_folder, "frame_%04d.png")
+    
+    cmd = [
+        FFMPEG_PATH,
+        "-y",
+        "-i", video_path,
+        "-vf", f"fps={1.0 / interval}",
+        "-vsync", "0",
+        "-start_number", "0"
+    ]
+    
+    if is_depth:
+        cmd += ["-pix_fmt", "gray16le"]
+    
+    cmd += ["-compression_level", str(png_compression)]
+    
+    cmd += [out_pattern]
+    
+    # Timestamp the start of this run on the output filesystem itself, so a
+    # clock difference with a network drive can't make new frames look old
+    marker_path = os.path.join(save_folder, ".extraction_started")
+    with open(marker_path, 'w'):
+        pass
+    run_started = os.path.getmtime(marker_path)
+    os.remove(marker_path)
+    
+    print(f"Extracting every {interval}s with FFmpeg: {' '.join(cmd)}")
+    try:
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error: FFmpeg could not extract frames from {video_path}: {e}")
         return
-    else:
-        print(f"✅ Successfully opened video: {video_path}")
-    
-    frame_rate = int(cap.get(cv2.CAP_PROP_FPS))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
-    if frame_rate == 0:
-        frame_rate = fps
-    
-    frame_interval = frame_rate * interval
-    print(f"Video FPS: {frame_rate}, Total Frames: {total_frames}, Extracting every {interval}s")
-    
-    frame_count = 0
+    # Count only the frames this run wrote: FFmpeg numbers them consecutively
+    # from 0, and leftovers from an earlier run that it did not overwrite are
+    # older than this run (2 s of slack covers coarse timestamp resolution)
     save_count = 0
-    
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
+    while True:
+        frame_path = os.path.join(save_folder, f"frame_{save_count:04d}.png")
+        if not os.path.exists(frame_path) or os.path.getmtime(frame_path) < run_started - 2:
             break
-        
-        if frame_count % frame_interval == 0:
-            filename = os.path.join(save_folder, f"frame_{save_count:04d}.png")
-            success = cv2.imwrite(filename, frame)
-            if success:
-                print(f"✅ Frame saved: {filename}")
-            else:
-                print(f"❌ Frame save failed: {filename}")
-            save_count += 1
-        frame_count += 1
-    
-    cap.release()
+        save_count += 1
     print(f"Total frames saved: {save_count} to {save_folder}")
 
 def organize_data(main_directory, output_directory, fps=15, interval=1):
@@ -70,17 +87,23 @@ def organize_data(main_directory, output_directory, fps=15, interval=1):
     depth_video_path = os.path.join(main_directory, "Depth_video.avi")
     calibration_file = os.path.join(main_directory, "calibration_params.txt")
     
-    if os.path.exists(rgb_video_path):
-        print(f"✅ RGB Video found: {rgb_video_path}")
-        extract_frames(rgb_video_path, rgb_output, fps, interval)
-    else:
-        print(f"❌ RGB Video missing in {main_directory}")
-    
-    if os.path.exists(depth_video_path):
-        print(f"✅ Depth Video found: {depth_video_path}")
-        extract_frames(depth_video_path, depth_output, fps, interval)
-    else:
-        print(f"❌ Depth Video missing in {main_directory}")
+    # RGB and Depth videos are extracted by two FFmpeg processes running in parallel
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = []
+        if os.path.exists(rgb_video_path):
+            print(f"✅ RGB Video found: {rgb_video_path}")
+            futures.append(executor.submit(extract_frames, rgb_video_path, rgb_output, fps, interval))
+        else:
+            print(f"❌ RGB Video missing in {main_directory}")
+        
+        if os.path.exists(depth_video_path):
+            print(f"✅ Depth Video found: {depth_video_path}")
+            futures.append(executor.submit(extract_frames, depth_video_path, depth_output, fps, interval))
+        else:
+            print(f"❌ Depth Video missing in {main_directory}")
+        
+        for future in futures:
+            future.result()
     
     if os.path.exists(calibration_file):
         dest_calibration_file = os.path.join(calibration_output, "calibration_params.txt")
@@ -92,12 +115,13 @@ def organize_data(main_directory, output_directory, fps=15, interval=1):
     print("✅ Data extraction and organization complete!")
 
 # Example usage
-main_directory = r"C:\ZED\DataCollection\Vidalia\Session_20250226_205001"  # Example path
-output_directory = r"M:\Research\Data\Weeds\Extra_testing\testing2"                # Example output
-fps = 15  # Default FPS of your camera
-interval = 1  # Extract 1 frame per second
+if __name__ == "__main__":
+    main_directory = r"C:\ZED\DataCollection\Vidalia\Session_20250226_205001"  # Example path
+    output_directory = r"M:\Research\Data\Weeds\Extra_testing\testing2"                # Example output
+    fps = 15  # Default FPS of your camera
+    interval = 1  # Extract 1 frame per second
 
-organize_data(main_directory, output_directory, fps, interval)
+    organize_data(main_directory, output_directory, fps, interval)
 
 
 
@@ -2,6 +2,8 @@ import os
 import shutil
 import subprocess
 import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 ###############################################################################
 # CONFIGURE YOUR FFMPEG PATH HERE
@@ -21,10 +23,14 @@ def get_next_frame_number():
 
 def save_next_frame_number(next_frame):
     """Save the next frame number to the global counter file."""
-    with open(GLOBAL_COUNTER_FILE, 'w') as f:
+    # Write to a temporary file and atomically swap it in, so a crash can never
+    # leave a truncated or corrupted counter file behind
+    counter_dir = os.path.dirname(GLOBAL_COUNTER_FILE) or "."
+    with tempfile.NamedTemporaryFile('w', delete=False, dir=counter_dir, suffix=".tmp") as f:
         json.dump({'next_frame': next_frame}, f)
+    os.replace(f.name, GLOBAL_COUNTER_FILE)
 
-def extract_frames_ffmpeg(video_path, save_folder, fps=15, interval=1, is_depth=False, start_frame=0):
+def extract_frames_ffmpeg(video_path, save_folder, fps=15, interval=1, is_depth=False, start_frame=0, png_compression=1):
     """
     Extract frames using FFmpeg from a video file (FFV1 in MKV).
     - video_path: path to the .mkv file
@@ -33,6 +39,7 @@ def extract_frames_ffmpeg(video_path, save_folder, fps=15, interval=1, is_depth=
     - interval: extract 1 frame every 'interval' seconds
     - is_depth: if True, treat as 16-bit depth video and preserve 16-bit PNG
     - start_frame: absolute frame number to start from
+    - png_compression: PNG zlib level 0-9 (1 = fastest; higher = smaller files, much slower)
     
     Returns the next available frame number
     """
@@ -47,12 +54,8 @@ def extract_frames_ffmpeg(video_path, save_folder, fps=15, interval=1, is_depth=
     # Calculate how many frames per second to extract
     extraction_fps = 1.0 / interval
 
-    # Use a temporary directory for extraction
-    temp_dir = os.path.join(save_folder, "temp_frames")
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    # Output temporary file pattern
-    temp_pattern = os.path.join(temp_dir, "temp_%04d.png")
+    # Output file pattern with absolute frame numbers (8 digits for larger datasets)
+    out_pattern = os.path.join(save_folder, "frame_%08d.png")
 
     # Build the ffmpeg command:
     cmd = [
@@ -67,30 +70,36 @@ def extract_frames_ffmpeg(video_path, save_folder, fps=15, interval=1, is_depth=
     if is_depth:
         cmd += ["-pix_fmt", "gray16le"]
 
-    # Specify the temporary output pattern
-    cmd += [temp_pattern]
+    # Fast PNG compression: zlib dominates write time, especially for 16-bit depth
+    cmd += ["-compression_level", str(png_compression)]
+
+    # Let FFmpeg number the frames from start_frame directly, no rename pass needed
+    cmd += ["-start_number", str(start_frame)]
+    cmd += [out_pattern]
 
     print(f"Running FFmpeg command: {' '.join(cmd)}")
     try:
+        # Timestamp the start of this run on the output filesystem itself, so a
+        # clock difference with a network drive can't make new frames look old
+        marker_path = os.path.join(save_folder, ".extraction_started")
+        with open(marker_path, 'w'):
+            pass
+        run_started = os.path.getmtime(marker_path)
+        os.remove(marker_path)
+
         subprocess.run(cmd, check=True)
-        print(f"✅ Frames extracted to temporary folder")
-        
-        # Get the number of frames extracted (to return for synchronization)
-        temp_files = sorted([f for f in os.listdir(temp_dir) if f.startswith("temp_")])
-        num_frames = len(temp_files)
-        
-        # Rename files with absolute frame numbers
-        current_frame = start_frame
-        for temp_file in temp_files:
-            temp_path = os.path.join(temp_dir, temp_file)
-            new_name = f"frame_{current_frame:08d}.png"  # 8 digits for larger datasets
-            new_path = os.path.join(save_folder, new_name)
-            shutil.move(temp_path, new_path)
-            current_frame += 1
-            
-        # Clean up temporary directory
-        os.rmdir(temp_dir)
-        print(f"✅ Frames renamed with absolute numbering starting from {start_frame}")
+
+        # Get the number of frames extracted (to return for synchronization).
+        # FFmpeg writes consecutive numbers from start_frame; leftovers from an
+        # earlier crashed run that it did not overwrite are older than this run.
+        # (2 s of slack covers coarse filesystem timestamp resolution.)
+        num_frames = 0
+        while True:
+            frame_path = os.path.join(save_folder, f"frame_{start_frame + num_frames:08d}.png")
+            if not os.path.exists(frame_path) or os.path.getmtime(frame_path) < run_started - 2:
+                break
+            num_frames += 1
+        print(f"✅ Frames extracted with absolute numbering starting from {start_frame}")
         
         return start_frame, num_frames  # Return start_frame and count for synchronization
     except subprocess.CalledProcessError as e:
@@ -125,23 +134,33 @@ def organize_data(main_directory, output_directory, fps=15, interval=1):
     depth_video_path = os.path.join(main_directory, "Depth_video.mkv")
     calibration_file = os.path.join(main_directory, "calibration_params.txt")
 
-    # Extract RGB frames first to determine frame count
-    if os.path.exists(rgb_video_path):
-        print(f"✅ RGB Video found: {rgb_video_path}")
-        start_frame, num_frames = extract_frames_ffmpeg(rgb_video_path, rgb_output, fps, interval, is_depth=False, start_frame=next_frame)
-        # Update the next frame number
+    # RGB and Depth use independent inputs and output folders, so run both FFmpeg
+    # processes concurrently. Depth frames get the SAME numbers as RGB frames.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        if os.path.exists(rgb_video_path):
+            print(f"✅ RGB Video found: {rgb_video_path}")
+            rgb_future = executor.submit(extract_frames_ffmpeg, rgb_video_path, rgb_output, fps, interval, is_depth=False, start_frame=next_frame)
+        else:
+            print(f"❌ RGB Video missing in {main_directory}")
+            rgb_future = None
+
+        if os.path.exists(depth_video_path):
+            print(f"✅ Depth Video found: {depth_video_path}")
+            depth_future = executor.submit(extract_frames_ffmpeg, depth_video_path, depth_output, fps, interval, is_depth=True, start_frame=next_frame)
+        else:
+            print(f"❌ Depth Video missing in {main_directory}")
+            depth_future = None
+
+        # The RGB frame count determines the next frame number
+        if rgb_future is not None:
+            start_frame, num_frames = rgb_future.result()
+        else:
+            start_frame, num_frames = next_frame, 0
         next_frame = start_frame + num_frames
-    else:
-        print(f"❌ RGB Video missing in {main_directory}")
-        start_frame, num_frames = next_frame, 0
-
-    # Extract Depth frames using the SAME frame numbers as RGB
-    if os.path.exists(depth_video_path):
-        print(f"✅ Depth Video found: {depth_video_path}")
-        extract_frames_ffmpeg(depth_video_path, depth_output, fps, interval, is_depth=True, start_frame=start_frame)
-        print(f"✅ Depth frames numbered to match RGB frames ({start_frame} to {start_frame + num_frames - 1})")
-    else:
-        print(f"❌ Depth Video missing in {main_directory}")
+
+        if depth_future is not None:
+            depth_future.result()
+            print(f"✅ Depth frames numbered to match RGB frames ({start_frame} to {start_frame + num_frames - 1})")
 
     # Copy calibration file if present
     if os.path.exists(calibration_file):